@@ -1,62 +1,25 @@
 import sys
-import json
 from pathlib import Path
 from datetime import datetime
 import logging
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt, Confirm
-from rich.table import Table
-from rich.progress import Progress, SpinnerColumn, TextColumn
 from snapshot.capture import save_project_contents
+from snapshot.config import (
+    add_configuration,
+    index_configurations,
+    load_config,
+    save_config,
+)
 from snapshot.exceptions import ProjectSnapshotError
 from snapshot.utils import copy_to_clipboard, configure_logging, sanitize_filename
 
-CONFIG_FILE = "config.json"
-MAX_CONFIGS_PER_PROJECT = 5
+SCRIPT_DIR = Path(__file__).resolve().parent
 console = Console()
 logger = configure_logging()
 
 
-def load_config() -> dict:
-    """
-    Load configuration from the JSON file with basic validation.
-
-    Returns:
-        dict: The loaded configuration or a default configuration if the file doesn't exist or is invalid.
-    """
-    if Path(CONFIG_FILE).exists():
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                config = json.load(f)
-                if (
-                    not isinstance(config, dict)
-                    or "configurations" not in config
-                    or not isinstance(config["configurations"], list)
-                ):
-                    raise ValueError("Invalid configuration structure")
-                return config
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(
-                f"Error loading {CONFIG_FILE}: {str(e)}. Using default configuration."
-            )
-    return {"configurations": []}
-
-
-def save_config(config: dict) -> None:
-    """
-    Save configuration to the JSON file.
-
-    Args:
-        config (dict): The configuration to save.
-    """
-    try:
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(config, f, indent=4)
-    except IOError as e:
-        logger.error(f"Error writing to {CONFIG_FILE}: {str(e)}")
-
-
 def get_target_directory(config: dict) -> Path:
     """
     Prompt user for the target directory.
@@ -86,6 +49,8 @@ def display_configurations(configurations: list) -> None:
     Args:
         configurations (list): List of available configurations.
     """
+    from rich.table import Table
+
     table = Table(title="Available configurations")
     table.add_column("ID", style="cyan", no_wrap=True)
     table.add_column("Project Name", style="magenta")
@@ -252,31 +217,6 @@ def edit_configuration(config: dict, index: int, new_config: dict) -> None:
     config["configurations"][index] = new_config
 
 
-def add_configuration(config: dict, new_config: dict) -> None:
-    """
-    Add a new configuration using FIFO if the limit is reached.
-
-    Args:
-        config (dict): The main configuration dictionary.
-        new_config (dict): The new configuration to add.
-    """
-    matching_configs = [
-        c for c in config["configurations"] if c["directory"] == new_config["directory"]
-    ]
-
-    if len(matching_configs) >= MAX_CONFIGS_PER_PROJECT:
-        # Remove the oldest configuration for this project
-        oldest_config = min(
-            matching_configs,
-            key=lambda x: datetime.strptime(x["last_used"], "%Y-%m-%d"),
-        )
-        config["configurations"].remove(oldest_config)
-        logger.info(f"Removed oldest configuration for {new_config['project_name']}")
-
-    config["configurations"].append(new_config)
-    logger.info(f"Added new configuration for {new_config['project_name']}")
-
-
 def main():
     """Main function to execute the project snapshot tool."""
     try:
@@ -292,9 +232,10 @@ def main():
         root_directory = get_target_directory(config)
         config["last_directory"] = str(root_directory)
 
-        matching_configs = [
-            c for c in config["configurations"] if c["directory"] == str(root_directory)
-        ]
+        matching_indices = index_configurations(config["configurations"]).get(
+            str(root_directory), []
+        )
+        matching_configs = [config["configurations"][i] for i in matching_indices]
 
         while True:
             if matching_configs:
@@ -313,14 +254,9 @@ def main():
                     edited_config = create_or_edit_configuration(
                         root_directory, matching_configs[index]
                     )
-                    edit_configuration(
-                        config,
-                        config["configurations"].index(matching_configs[index]),
-                        edited_config,
-                    )
+                    edit_configuration(config, matching_indices[index], edited_config)
                     matching_configs[index] = edited_config
                     selected_config = edited_config
-                    save_config(config)
                     break
                 elif choice == str(len(matching_configs) + 2):  # Delete
                     delete_choice = Prompt.ask(
@@ -328,11 +264,14 @@ def main():
                         choices=[str(i) for i in range(1, len(matching_configs) + 1)],
                     )
                     index = int(delete_choice) - 1
-                    config_index = config["configurations"].index(
-                        matching_configs[index]
-                    )
+                    config_index = matching_indices.pop(index)
                     deleted_config = config["configurations"].pop(config_index)
                     matching_configs.pop(index)
+                    # Entries after the deleted one shift down by one
+                    matching_indices = [
+                        i - 1 if i > config_index else i for i in matching_indices
+                    ]
+                    # Persist now so the deletion survives an abort at the next prompt
                     save_config(config)
                     console.print(
                         f"[green]Configuration '{deleted_config['project_name']}' deleted successfully.[/green]"
@@ -345,7 +284,6 @@ def main():
                         add_configuration(config, new_config)
                         matching_configs.append(new_config)
                         selected_config = new_config
-                        save_config(config)
                         break
                     continue
 
@@ -364,7 +302,6 @@ def main():
                         add_configuration(config, new_config)
                         matching_configs.append(new_config)
                         selected_config = new_config
-                    save_config(config)
                     break
             else:
                 console.print(
@@ -376,10 +313,12 @@ def main():
                 console.print()
                 selected_config = create_or_edit_configuration(root_directory)
                 add_configuration(config, selected_config)
-                save_config(config)
                 break
 
-        selected_config["last_used"] = datetime.now().strftime("%Y-%m-%d")
+        now = datetime.now()
+
+        # Persist the selection once, after the loop; only Delete saves earlier
+        selected_config["last_used"] = now.strftime("%Y-%m-%d")
         save_config(config)
 
         console.print(
@@ -393,15 +332,14 @@ def main():
         )
 
         output_filename = selected_config["output_pattern"].format(
-            time=datetime.now().strftime("%Y-%m-%d-%H%M%S")
+            time=now.strftime("%Y-%m-%d-%H%M%S")
         )
         output_path = (
-            Path(__file__).resolve().parent
-            / "output"
-            / selected_config["project_name"]
-            / output_filename
+            SCRIPT_DIR / "output" / selected_config["project_name"] / output_filename
         )
 
+        from rich.progress import Progress, SpinnerColumn, TextColumn
+
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
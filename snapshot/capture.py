@@ -1,26 +1,82 @@
+import functools
+import io
 import logging
+import operator
 import os
+import re
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
+from types import MappingProxyType
 import pathspec
-import mmap
 from snapshot.exceptions import ProjectSnapshotError
 
+try:
+    import re2
+except ImportError:
+    re2 = None
+
 logger = logging.getLogger(__name__)
 
-BINARY_EXTENSIONS = {
-    ".jpg",
-    ".jpeg",
-    ".png",
-    ".gif",
-    ".bmp",
-    ".tiff",
-    ".exe",
-    ".dll",
-    ".so",
-    ".dylib",
-    ".bin",
-    ".pyc",
-}
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back on bad values."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r; using %d", name, value, default)
+        return default
+
+
+WALK_WORKERS = min(16, (os.cpu_count() or 4) * 2)
+STREAM_THRESHOLD = 64 * 1024  # Stream files larger than 64KB into the output
+COPY_BUFSIZE = 1 << 20
+OUTPUT_BUFSIZE = 1 << 20
+READ_WORKERS = min(32, (os.cpu_count() or 4) * 4)
+READ_AHEAD = 64
+SNIFF_BYTES = 4096  # Leading bytes checked for NUL to spot binaries
+# Files larger than this are listed with a size stub instead of their contents
+MAX_EMBED_BYTES = _env_int("SNAPSHOT_MAX_EMBED_BYTES", 5 * 1024 * 1024)
+TREE_INDENTS = tuple("    " * depth for depth in range(64))
+
+BINARY_EXTENSIONS = frozenset(
+    {
+        ".jpg",
+        ".jpeg",
+        ".png",
+        ".gif",
+        ".bmp",
+        ".tiff",
+        ".exe",
+        ".dll",
+        ".so",
+        ".dylib",
+        ".bin",
+        ".pyc",
+    }
+)
+
+
+# Directories that never belong in a snapshot, excluded even without a .gitignore
+EXCLUDED_DIRNAMES = frozenset(
+    {
+        "__pycache__",
+        "venv",
+        ".venv",
+        ".git",
+        "node_modules",
+        ".mypy_cache",
+        ".pytest_cache",
+    }
+)
+EXCLUDED_DIRS_SPEC = pathspec.GitIgnoreSpec.from_lines(
+    f"{dirname}/" for dirname in sorted(EXCLUDED_DIRNAMES)
+)
 
 
 def is_binary_file(file_path: Path) -> bool:
@@ -28,11 +84,32 @@ def is_binary_file(file_path: Path) -> bool:
     return file_path.suffix.lower() in BINARY_EXTENSIONS
 
 
-def load_gitignore_patterns(directory: Path) -> pathspec.PathSpec:
-    """Load .gitignore patterns from the specified directory."""
+def _extension(filename: str) -> str:
+    """Return the lowercased extension of a file name, matching ``Path.suffix``."""
+    dot = filename.rfind(".")
+    return filename[dot:].lower() if dot > 0 else ""
+
+
+def load_gitignore_patterns(directory: Path) -> pathspec.GitIgnoreSpec:
+    """
+    Load .gitignore patterns from the specified directory.
+
+    Compiled specs are cached per file and modification time, so repeated
+    captures of the same project only re-parse a .gitignore after it changes.
+    """
     gitignore_path = directory / ".gitignore"
+    try:
+        mtime = gitignore_path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    return _compile_gitignore(gitignore_path, mtime)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_gitignore(gitignore_path: Path, mtime) -> pathspec.GitIgnoreSpec:
+    """Parse a .gitignore file into a GitIgnoreSpec; *mtime* is None if missing."""
     patterns = []
-    if gitignore_path.exists():
+    if mtime is not None:
         try:
             with gitignore_path.open("r") as file:
                 patterns = [
@@ -42,12 +119,11 @@ def load_gitignore_patterns(directory: Path) -> pathspec.PathSpec:
                 ]
         except IOError as e:
             logger.warning(f"Error reading .gitignore file: {str(e)}")
-    return pathspec.PathSpec.from_lines("gitwildmatch", patterns)
+    return pathspec.GitIgnoreSpec.from_lines(patterns)
 
 
-def get_language(file_extension):
-    """Get the language identifier for syntax highlighting."""
-    language_map = {
+LANGUAGE_MAP = MappingProxyType(
+    {
         ".py": "python",
         ".js": "javascript",
         ".jsx": "javascript",
@@ -82,41 +158,330 @@ def get_language(file_extension):
         ".dockerfile": "dockerfile",
         ".txt": "text",
     }
-    return language_map.get(file_extension.lower(), "")
+)
+
+
+@functools.lru_cache(maxsize=256)
+def get_language(file_extension):
+    """Get the language identifier for syntax highlighting."""
+    return LANGUAGE_MAP.get(file_extension.lower(), "")
+
+
+MARKDOWN_ESCAPES = str.maketrans({char: "\\" + char for char in r"\_*[]()#+-.!"})
 
 
 def escape_markdown(text):
     """Escape markdown syntax in the given text."""
-    text = text.replace("```", "\\`\\`\\`")
-    chars_to_escape = r"\_*[]()#+-.!"
-    for char in chars_to_escape:
-        text = text.replace(char, "\\" + char)
+    return text.replace("```", "\\`\\`\\`").translate(MARKDOWN_ESCAPES)
+
+
+def _looks_binary(head: bytes) -> bool:
+    """Check the start of a file for a NUL byte, the same heuristic git uses."""
+    return b"\0" in head
+
+
+def _decode_text(data) -> str:
+    """Decode UTF-8 bytes with universal newlines, as text-mode reads do."""
+    text = str(data, "utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
     return text
 
 
 def read_file_content(file_path: Path) -> str:
-    """Read the content of a file, using memory mapping for large files."""
+    """Read the content of a text file, rejecting binaries."""
     if is_binary_file(file_path):
         raise ProjectSnapshotError(f"Skipping binary file: {file_path}")
 
     try:
-        file_size = file_path.stat().st_size
-        if file_size > 1_000_000:  # Use mmap for files larger than 1MB
-            try:
-                with file_path.open("rb") as f:
-                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
-                        return m.read().decode("utf-8")
-            except (ValueError, OSError) as e:
-                logger.warning(
-                    f"Error using mmap for {file_path}: {str(e)}. Falling back to normal read."
-                )
-                return file_path.read_text(encoding="utf-8")
-        else:
-            return file_path.read_text(encoding="utf-8")
+        with file_path.open("rb") as f:
+            head = f.read(SNIFF_BYTES)
+            if _looks_binary(head):
+                raise ProjectSnapshotError(f"Skipping binary file: {file_path}")
+            return _decode_text(head + f.read())
     except (IOError, UnicodeDecodeError) as e:
         raise ProjectSnapshotError(f"Error reading file {file_path}: {str(e)}")
 
 
+def _cache_by_identity(maxsize: int):
+    """
+    Memoize a function of unhashable arguments, keyed on the arguments' identity.
+
+    Each entry keeps its arguments alive so their ids cannot be reused while
+    cached, and the oldest entry is evicted once *maxsize* is exceeded. The
+    gitignore specs passed in are themselves cached per file and mtime, so an
+    unchanged project yields the same objects from one capture to the next.
+    """
+
+    def decorator(func):
+        cache = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = tuple(map(id, args))
+            with lock:
+                entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+            result = func(*args)
+            with lock:
+                cache[key] = (args, result)
+                if len(cache) > maxsize:
+                    del cache[next(iter(cache))]
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+@_cache_by_identity(maxsize=16)
+def combine_ignore_specs(*specs: pathspec.PathSpec) -> pathspec.PathSpec:
+    """Combine ignore specs in order, later patterns taking precedence."""
+    return functools.reduce(operator.add, specs)
+
+
+def _compile_union(source: str):
+    """Compile a pattern alternation, using RE2's linear-time engine if installed."""
+    if re2 is not None:
+        try:
+            return re2.compile(source)
+        except re2.error:
+            pass
+    return re.compile(source)
+
+
+@_cache_by_identity(maxsize=16)
+def compile_ignore_matcher(spec: pathspec.PathSpec):
+    """
+    Build a function returning the subset of a list of paths that *spec* ignores.
+
+    The patterns are joined into one alternation so each path costs a single
+    regex match instead of one per pattern. Without negated patterns a path is
+    ignored as soon as anything matches. Otherwise the alternation is built in
+    reverse, so the first alternative to match is the last matching pattern,
+    which decides the outcome. The one case that also depends on earlier
+    matches, a negated directory pattern under gitignore precedence, is
+    settled by *spec* itself.
+    """
+    patterns = [pattern for pattern in spec.patterns if pattern.include is not None]
+    if not patterns:
+        return lambda paths: set()
+
+    # Each translated pattern names its directory marker group; names must be
+    # unique within one regex and the union does not need them
+    sources = [
+        re.sub(r"\(\?P<\w+>", "(", pattern.regex.pattern) for pattern in patterns
+    ]
+
+    if all(pattern.include for pattern in patterns):
+        match = _compile_union("|".join(f"(?:{source})" for source in sources)).match
+        return lambda paths: {path for path in paths if match(path)}
+
+    match = re.compile(
+        "|".join(
+            f"(?P<p{index}>{sources[index]})" for index in reversed(range(len(sources)))
+        )
+    ).match
+
+    def match_ignored(paths):
+        ignored = set()
+        for path in paths:
+            m = match(path)
+            if m is None:
+                continue
+            pattern = patterns[int(m.lastgroup[1:])]
+            if pattern.include:
+                ignored.add(path)
+            elif pattern.match_file(path).match.groupdict().get("ps_d"):
+                if spec.match_file(path):
+                    ignored.add(path)
+        return ignored
+
+    return match_ignored
+
+
+def _scan_directory(path: str, rel: str, match_ignored):
+    """
+    List one directory, returning its kept files and subdirectories.
+
+    Files are ``(rel_path, abs_path, size)`` and subdirectories ``(rel_path,
+    abs_path)``, each sorted by name. Relative paths are built incrementally
+    with forward slashes and passed to *match_ignored* in one batch per
+    directory, and entry types and sizes come from the directory entry rather
+    than a separate stat later.
+    """
+    with os.scandir(path) as it:
+        entries = [
+            (
+                rel + "/" + entry.name if rel else entry.name,
+                entry,
+                entry.is_dir(follow_symlinks=False),
+            )
+            for entry in it
+        ]
+    # Sort once per directory so the output does not depend on listing order
+    entries.sort(key=operator.itemgetter(0))
+    # Directories are matched with a trailing slash so "name/" patterns apply
+    ignored = match_ignored(
+        [child_rel + "/" if is_dir else child_rel for child_rel, _, is_dir in entries]
+    )
+
+    files = []
+    subdirs = []
+    for child_rel, entry, is_dir in entries:
+        if is_dir:
+            if child_rel + "/" not in ignored:
+                subdirs.append((child_rel, entry.path))
+        # Follow symlinks here so linked files are captured, as os.walk listed them
+        elif child_rel not in ignored and entry.is_file():
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                size = 0
+            files.append((child_rel, entry.path, size))
+    return files, subdirs
+
+
+def parallel_walk(root: str, spec: pathspec.PathSpec, max_workers: int = WALK_WORKERS):
+    """
+    Walk the tree under *root*, scanning directories concurrently.
+
+    Directories are listed by a bounded thread pool, each finished listing
+    queueing its subdirectories, so slow metadata lookups overlap. The entries
+    are then yielded in a stable depth-first order as ``(rel_path, abs_path,
+    is_dir, size)``: each directory's files first, then each subdirectory
+    followed by its contents. The size of a directory is reported as 0.
+    Ignored directories are never descended into, and unreadable
+    subdirectories are logged and skipped.
+    """
+    match_ignored = compile_ignore_matcher(spec)
+    listings = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_scan_directory, root, "", match_ignored): ""}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel = pending.pop(future)
+                try:
+                    files, subdirs = future.result()
+                except OSError as e:
+                    if not rel:
+                        raise
+                    logger.warning("Error scanning directory %s: %s", rel, e)
+                    files, subdirs = [], []
+                listings[rel] = (files, subdirs)
+                for child_rel, child_path in subdirs:
+                    future = executor.submit(
+                        _scan_directory, child_path, child_rel, match_ignored
+                    )
+                    pending[future] = child_rel
+
+    def emit(rel):
+        files, subdirs = listings[rel]
+        for child_rel, child_path, size in files:
+            yield child_rel, child_path, False, size
+        for child_rel, child_path in subdirs:
+            yield child_rel, child_path, True, 0
+            yield from emit(child_rel)
+
+    return emit("")
+
+
+def stream_file_content(file_path: Path, out, language: str) -> None:
+    """
+    Copy a large text file into *out* as a fenced code block, chunk by chunk.
+
+    The file is never held in memory as a whole. Markdown is escaped block by
+    block, holding back trailing backticks so a fence split across two blocks
+    is still escaped. If reading fails part way through, the partially
+    written block is closed before the error is raised.
+    """
+    if is_binary_file(file_path):
+        raise ProjectSnapshotError(f"Skipping binary file: {file_path}")
+
+    try:
+        raw = file_path.open("rb")
+    except IOError as e:
+        raise ProjectSnapshotError(f"Error reading file {file_path}: {str(e)}")
+
+    with io.TextIOWrapper(raw, encoding="utf-8") as src:
+        try:
+            head = raw.read(SNIFF_BYTES)
+            raw.seek(0)
+        except IOError as e:
+            raise ProjectSnapshotError(f"Error reading file {file_path}: {str(e)}")
+        if _looks_binary(head):
+            raise ProjectSnapshotError(f"Skipping binary file: {file_path}")
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(src.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        out.write(f"```{language}\n")
+        escape = language == "markdown"
+        carry = ""
+        tail = ""
+        try:
+            while block := src.read(COPY_BUFSIZE):
+                if escape:
+                    block = carry + block
+                    cut = len(block.rstrip("`"))
+                    carry = block[cut:]
+                    block = escape_markdown(block[:cut])
+                if block:
+                    out.write(block)
+                    tail = block
+            if carry:
+                out.write(escape_markdown(carry))
+                tail = carry
+        except (IOError, UnicodeDecodeError) as e:
+            out.write("\n```\n\n")
+            raise ProjectSnapshotError(f"Error reading file {file_path}: {str(e)}")
+    if not tail.endswith("\n"):
+        out.write("\n")
+    out.write("```\n\n")
+
+
+def _load_file_content(file_path: Path, extension: str, size: int):
+    """
+    Read a file for the snapshot.
+
+    Returns None for binary and oversized files, which are skipped, and for
+    large files, which are streamed straight into the output.
+    """
+    if extension in BINARY_EXTENSIONS or size > min(STREAM_THRESHOLD, MAX_EMBED_BYTES):
+        return None
+    return read_file_content(file_path)
+
+
+def _prefetch(func, items, max_workers: int = READ_WORKERS, window: int = READ_AHEAD):
+    """
+    Yield a future for ``func(*item)`` for each item, in order.
+
+    Calls run on a thread pool at most *window* items ahead of the consumer,
+    so slow opens overlap without buffering the whole project in memory.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, *item))
+            if len(pending) >= window:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+
+def _write_file_block(out, file_content: str, language: str) -> None:
+    """Write one file's contents to *out* as a fenced code block."""
+    out.write(f"```{language}\n")
+    if language == "markdown":
+        out.write(escape_markdown(file_content))
+    else:
+        out.write(file_content)
+    if not file_content.endswith("\n"):
+        out.write("\n")
+    out.write("```\n\n")
+
+
 def save_project_contents(
     root_directory: Path,
     output_filename: Path,
@@ -129,64 +494,77 @@ def save_project_contents(
     processed = 0
     skipped = 0
     errors = []
-    content = [f"# Project Snapshot: {project_name}\n\n"]
+    # Write next to the destination and rename into place once complete, so an
+    # interrupted capture never leaves a half-written snapshot behind
+    temp_filename = output_filename.with_name(output_filename.name + ".tmp")
 
     try:
         root_patterns = load_gitignore_patterns(Path.cwd())
         target_patterns = load_gitignore_patterns(root_directory)
 
-        all_patterns = root_patterns + target_patterns
-
-        if include_in_prompt:
-            content.append("<project_contents>\n")
-
-        content.append("## Directory Tree\n\n```\n")
-
-        for dirpath, dirnames, filenames in os.walk(root_directory):
-            rel_path = Path(dirpath).relative_to(root_directory)
-
-            dirnames[:] = [
-                d for d in dirnames if not all_patterns.match_file(rel_path / d)
-            ]
-            filenames = [
-                f for f in filenames if not all_patterns.match_file(rel_path / f)
-            ]
-
-            level = len(rel_path.parts)
-            indent = "    " * level
-            content.append(f"{indent}{Path(dirpath).name}/\n")
-            subindent = "    " * (level + 1)
-            for filename in filenames:
-                content.append(f"{subindent}{filename}\n")
-        content.append("```\n\n")
-
-        content.append("## File Contents\n\n")
-        for dirpath, dirnames, filenames in os.walk(root_directory):
-            rel_path = Path(dirpath).relative_to(root_directory)
-
-            dirnames[:] = [
-                d for d in dirnames if not all_patterns.match_file(rel_path / d)
-            ]
-            filenames = [
-                f for f in filenames if not all_patterns.match_file(rel_path / f)
-            ]
-
-            for filename in filenames:
-                file_path = Path(dirpath) / filename
-                relative_file_path = file_path.relative_to(root_directory)
-                content.append(f"### {relative_file_path}\n\n")
+        # Project patterns come last so they can re-include a default exclusion
+        all_patterns = combine_ignore_specs(
+            EXCLUDED_DIRS_SPEC, root_patterns, target_patterns
+        )
+
+        try:
+            output_filename.parent.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Failed to create output directory: {e}")
+            raise ProjectSnapshotError(f"Failed to create output directory: {e}")
+
+        with open(
+            temp_filename, "w", encoding="utf-8", buffering=OUTPUT_BUFSIZE
+        ) as out:
+            out.write(f"# Project Snapshot: {project_name}\n\n")
+            if include_in_prompt:
+                out.write("<project_contents>\n")
+
+            out.write("## Directory Tree\n\n```\n")
+            out.write(f"{root_directory.name}/\n")
+            files = []
+            for rel_path, abs_path, is_dir, size in parallel_walk(
+                str(root_directory), all_patterns
+            ):
+                depth = rel_path.count("/") + 1
+                if depth < len(TREE_INDENTS):
+                    indent = TREE_INDENTS[depth]
+                else:
+                    indent = "    " * depth
+                name = rel_path.rpartition("/")[2]
+                if is_dir:
+                    out.write(f"{indent}{name}/\n")
+                else:
+                    out.write(f"{indent}{name}\n")
+                    files.append((rel_path, abs_path, _extension(name), size))
+            out.write("```\n\n")
+
+            out.write("## File Contents\n\n")
+            loaded = _prefetch(
+                _load_file_content,
+                (
+                    (Path(abs_path), extension, size)
+                    for _, abs_path, extension, size in files
+                ),
+            )
+            for (rel_path, abs_path, extension, size), future in zip(files, loaded):
+                out.write(f"### {rel_path}\n\n")
+                if extension in BINARY_EXTENSIONS:
+                    logger.info("Skipping binary file: %s", abs_path)
+                    skipped += 1
+                    continue
+                if size > MAX_EMBED_BYTES:
+                    logger.info("Skipping large file (%d bytes): %s", size, abs_path)
+                    out.write(f"<skipped: {size} bytes>\n\n")
+                    skipped += 1
+                    continue
+                language = get_language(extension)
                 try:
-                    file_content = read_file_content(file_path)
-                    language = get_language(file_path.suffix)
-                    if language == "markdown":
-                        content.append(f"```{language}\n")
-                        content.append(escape_markdown(file_content))
+                    file_content = future.result()
+                    if file_content is None:
+                        stream_file_content(Path(abs_path), out, language)
                     else:
-                        content.append(f"```{language}\n")
-                        content.append(file_content)
-                    if not file_content.endswith("\n"):
-                        content.append("\n")
-                    content.append("```\n\n")
+                        _write_file_block(out, file_content, language)
                     processed += 1
                 except ProjectSnapshotError as e:
                     if "Skipping binary file" in str(e):
@@ -195,30 +573,26 @@ def save_project_contents(
                     else:
                         logger.warning(str(e))
                         errors.append(str(e))
-                        content.append("```\n")
-                        content.append("File content not displayed due to an error.\n")
-                        content.append("```\n\n")
-
-        if include_in_prompt:
-            content.append("</project_contents>\n\n")
-            try:
-                with open("prompt.txt", "r") as f:
-                    content.append(f.read())
-            except IOError as e:
-                logger.error(f"Error reading prompt.txt: {str(e)}")
-                content.append("Error: Unable to include prompt content.\n")
+                        out.write("```\n")
+                        out.write("File content not displayed due to an error.\n")
+                        out.write("```\n\n")
 
-        try:
-            output_filename.parent.mkdir(parents=True, exist_ok=True)
-        except OSError as e:
-            logger.error(f"Failed to create output directory: {e}")
-            raise ProjectSnapshotError(f"Failed to create output directory: {e}")
+            if include_in_prompt:
+                out.write("</project_contents>\n\n")
+                try:
+                    with open("prompt.txt", "r") as f:
+                        shutil.copyfileobj(f, out, COPY_BUFSIZE)
+                except IOError as e:
+                    logger.error(f"Error reading prompt.txt: {str(e)}")
+                    out.write("Error: Unable to include prompt content.\n")
 
-        with open(output_filename, "w") as f:
-            f.write("".join(content))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp_filename, output_filename)
 
         logger.info(f"Project contents saved to: {output_filename}")
         return {"processed": processed, "skipped": skipped, "errors": errors}
     except Exception as e:
+        temp_filename.unlink(missing_ok=True)
         logger.error(f"Error saving project contents: {e}")
         raise ProjectSnapshotError(f"Error saving project contents: {str(e)}")
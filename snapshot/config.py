@@ -0,0 +1,103 @@
+import json
+import logging
+from collections import defaultdict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = "config.json"
+MAX_CONFIGS_PER_PROJECT = 5
+
+
+def _dumps(config: dict) -> bytes:
+    """Serialize a configuration, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(config, option=orjson.OPT_INDENT_2)
+    return json.dumps(config, indent=4).encode("utf-8")
+
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def load_config() -> dict:
+    """
+    Load configuration from the JSON file with basic validation.
+
+    Returns:
+        dict: The loaded configuration or a default configuration if the file doesn't exist or is invalid.
+    """
+    try:
+        with open(CONFIG_FILE, "rb") as f:
+            config = _loads(f.read())
+        if (
+            not isinstance(config, dict)
+            or "configurations" not in config
+            or not isinstance(config["configurations"], list)
+        ):
+            raise ValueError("Invalid configuration structure")
+        return config
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error(
+            f"Error loading {CONFIG_FILE}: {str(e)}. Using default configuration."
+        )
+    return {"configurations": []}
+
+
+def save_config(config: dict) -> None:
+    """
+    Save configuration to the JSON file.
+
+    Args:
+        config (dict): The configuration to save.
+    """
+    try:
+        with open(CONFIG_FILE, "wb") as f:
+            f.write(_dumps(config))
+    except IOError as e:
+        logger.error(f"Error writing to {CONFIG_FILE}: {str(e)}")
+
+
+def index_configurations(configurations: list) -> dict:
+    """
+    Group configuration positions by project directory.
+
+    Args:
+        configurations (list): List of configurations.
+
+    Returns:
+        dict: Maps each directory to the list indices of its configurations, in order.
+    """
+    index = defaultdict(list)
+    for i, config in enumerate(configurations):
+        index[config["directory"]].append(i)
+    return index
+
+
+def add_configuration(config: dict, new_config: dict) -> None:
+    """
+    Add a new configuration using FIFO if the limit is reached.
+
+    Args:
+        config (dict): The main configuration dictionary.
+        new_config (dict): The new configuration to add.
+    """
+    matching_configs = [
+        c for c in config["configurations"] if c["directory"] == new_config["directory"]
+    ]
+
+    if len(matching_configs) >= MAX_CONFIGS_PER_PROJECT:
+        # Remove the oldest configuration for this project; "%Y-%m-%d" dates
+        # sort chronologically as plain strings
+        oldest_config = min(matching_configs, key=lambda x: x["last_used"])
+        config["configurations"].remove(oldest_config)
+        logger.info(f"Removed oldest configuration for {new_config['project_name']}")
+
+    config["configurations"].append(new_config)
+    logger.info(f"Added new configuration for {new_config['project_name']}")
@@ -1,3 +1,4 @@
+import functools
 import logging
 import pyperclip
 from pathvalidate import sanitize_filename as validate_filename
@@ -27,6 +28,7 @@ def copy_to_clipboard(text: str) -> bool:
         return False
 
 
+@functools.lru_cache(maxsize=1024)
 def sanitize_filename(filename: str) -> str:
     """Sanitize the filename to ensure it's valid and safe."""
     return validate_filename(filename)
@@ -1,49 +1,219 @@
 import streamlit as st
+import os
 import sys
-import json
 from pathlib import Path
 from datetime import datetime
 import logging
 from snapshot.capture import save_project_contents
+from snapshot.config import (
+    MAX_CONFIGS_PER_PROJECT,
+    add_configuration,
+    index_configurations,
+    load_config,
+    save_config,
+)
 from snapshot.exceptions import ProjectSnapshotError
 from snapshot.utils import copy_to_clipboard, configure_logging, sanitize_filename
 
 # Configure logging
 logger = configure_logging()
 
-CONFIG_FILE = "config.json"
-MAX_CONFIGS_PER_PROJECT = 5
+SCRIPT_DIR = Path(__file__).resolve().parent
+PREVIEW_BYTES = 64 * 1024
 
-# Load config
-@st.cache_data
-def load_config():
-    if Path(CONFIG_FILE).exists():
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                config = json.load(f)
-                if (
-                    not isinstance(config, dict)
-                    or "configurations" not in config
-                    or not isinstance(config["configurations"], list)
-                ):
-                    raise ValueError("Invalid configuration structure")
-                return config
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(
-                f"Error loading {CONFIG_FILE}: {str(e)}. Using default configuration."
-            )
-    return {"configurations": []}
+# Keep the config in session state and write it back only when it changes
+def get_config():
+    if "config" not in st.session_state:
+        st.session_state.config = load_config()
+        st.session_state.config_dirty = False
+    return st.session_state.config
 
-# Save config
-def save_config(config):
-    try:
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(config, f, indent=4)
-    except IOError as e:
-        logger.error(f"Error writing to {CONFIG_FILE}: {str(e)}")
+def get_configs_by_dir(config):
+    if "configs_by_dir" not in st.session_state:
+        st.session_state.configs_by_dir = index_configurations(config["configurations"])
+    return st.session_state.configs_by_dir
+
+def mark_config_dirty():
+    st.session_state.config_dirty = True
+    st.session_state.pop("configs_by_dir", None)
+
+def save_config_if_dirty(config):
+    if st.session_state.get("config_dirty"):
+        save_config(config)
+        st.session_state.config_dirty = False
+
+def read_preview(path, limit=PREVIEW_BYTES):
+    # Show the head and tail of large snapshots rather than the whole file
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= 2 * limit:
+            return f.read().decode("utf-8", errors="replace")
+        head = f.read(limit)
+        f.seek(-limit, os.SEEK_END)
+        tail = f.read()
+    omitted = size - 2 * limit
+    return (
+        head.decode("utf-8", errors="replace")
+        + f"\n\n... {omitted} bytes omitted ...\n\n"
+        + tail.decode("utf-8", errors="replace")
+    )
 
 def get_subdirectories(path):
-    return [d for d in Path(path).iterdir() if d.is_dir()]
+    # Entry types come from the directory listing, so no stat per entry
+    try:
+        with os.scandir(path) as it:
+            return sorted(
+                (entry for entry in it if entry.is_dir(follow_symlinks=False)),
+                key=lambda entry: entry.name,
+            )
+    except PermissionError:
+        logger.warning(f"Permission denied listing {path}")
+        return []
+
+# Fall back to a plain function on Streamlit releases without fragments
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", lambda func: func)
+
+def publish_selection(root_directory, selected_config):
+    # Hand the sidebar's choice to the main panel, refreshing the whole app
+    # only when a fragment-only rerun changed it
+    selection = (root_directory, selected_config)
+    changed = st.session_state.get("selection") != selection
+    st.session_state.selection = selection
+    if changed:
+        # Results belong to the previous selection
+        st.session_state.pop("last_snapshot", None)
+    if changed and not st.session_state.get("in_app_run"):
+        st.rerun()
+
+# Sidebar for configuration management; widget changes rerun only this fragment
+@fragment
+def sidebar_controls():
+    st.header("Configuration")
+    config = get_config()
+
+    # Directory selection
+    st.subheader("1. Select Project Directory")
+
+    # Use session state to store the selected directory
+    if "root_directory" not in st.session_state:
+        st.session_state.root_directory = config.get("last_directory", str(Path.cwd()))
+
+    current_path = Path(st.session_state.root_directory)
+    st.write(f"Current directory: {current_path}")
+
+    # Go up one level
+    if current_path != current_path.root:
+        if st.button("⬆️ Up one level"):
+            st.session_state.root_directory = str(current_path.parent)
+            st.rerun()  # Changed from st.experimental_rerun()
+
+    # List subdirectories
+    subdirs = get_subdirectories(current_path)
+    if subdirs:
+        selected_subdir = st.selectbox("Select subdirectory", [""] + [d.name for d in subdirs])
+        if selected_subdir:
+            st.session_state.root_directory = str(current_path / selected_subdir)
+            st.rerun()  # Changed from st.experimental_rerun()
+
+    # Manual input
+    root_directory = st.text_input("Or enter path manually", value=st.session_state.root_directory, key="directory_input")
+
+    if not Path(root_directory).is_dir():
+        st.error("Invalid directory. Please select a valid directory or enter a valid path.")
+        publish_selection(None, None)
+        return
+
+    # Update the last_directory in config
+    if config.get("last_directory") != root_directory:
+        config["last_directory"] = root_directory
+        mark_config_dirty()
+
+    # Configuration management
+    st.subheader("2. Manage Configurations")
+    matching_indices = get_configs_by_dir(config).get(root_directory, [])
+    matching_configs = [config["configurations"][i] for i in matching_indices]
+
+    if matching_configs:
+        # Select by position so identical configurations stay distinct
+        selected_pos = st.selectbox(
+            "Select Configuration",
+            options=range(len(matching_configs)),
+            format_func=lambda pos: matching_configs[pos]['project_name'],
+            key="config_select"
+        )
+        selected_config = matching_configs[selected_pos]
+
+        action = st.radio("Action", ["Use Selected", "Edit", "Delete", "Create New"])
+    else:
+        st.info("No existing configurations found for this directory.")
+        selected_config = None
+        action = "Create New"
+
+    if action in ["Edit", "Create New"]:
+        st.subheader("3. Configure Snapshot")
+        project_name = st.text_input("Project Name", value=selected_config['project_name'] if action == "Edit" else Path(root_directory).name)
+        output_pattern = st.text_input("Output Pattern", value=selected_config['output_pattern'] if action == "Edit" else f"{project_name}_contents-{{time}}.md")
+        include_in_prompt = st.checkbox("Include in AI prompt", value=selected_config['include_in_prompt'] if action == "Edit" else True)
+
+        if st.button("Save Configuration"):
+            new_config = {
+                "project_name": sanitize_filename(project_name),
+                "directory": root_directory,
+                "output_pattern": output_pattern,
+                "include_in_prompt": include_in_prompt,
+                "last_used": datetime.now().strftime("%Y-%m-%d"),
+            }
+
+            if action == "Edit":
+                config["configurations"][matching_indices[selected_pos]] = new_config
+            else:
+                if len(matching_indices) >= MAX_CONFIGS_PER_PROJECT:
+                    st.warning(f"Maximum configurations ({MAX_CONFIGS_PER_PROJECT}) reached. Replacing oldest.")
+                add_configuration(config, new_config)
+
+            mark_config_dirty()
+            save_config_if_dirty(config)
+            st.success("Configuration saved!")
+            st.rerun()  # Changed from st.experimental_rerun()
+
+    elif action == "Delete":
+        if st.button("Confirm Deletion"):
+            del config["configurations"][matching_indices[selected_pos]]
+            mark_config_dirty()
+            save_config_if_dirty(config)
+            st.success("Configuration deleted!")
+            st.rerun()  # Changed from st.experimental_rerun()
+
+    save_config_if_dirty(config)
+    publish_selection(root_directory, selected_config)
+
+def show_snapshot_results(output_path, result):
+    # Rendered outside the Generate branch, so these buttons survive the rerun
+    # their own clicks trigger; the file is only read when asked for
+    st.subheader("Snapshot Results")
+    st.write(f"**Output File:** {output_path}")
+    st.write(f"**Processed Files:** {result['processed']}")
+    st.write(f"**Skipped Files:** {result['skipped']}")
+    st.write(f"**Errors:** {len(result['errors'])}")
+    
+    if result['errors']:
+        with st.expander("View Errors"):
+            for error in result['errors']:
+                st.write(error)
+    
+    if st.button("Copy Output Path"):
+        if copy_to_clipboard(str(output_path)):
+            st.success("Output path copied to clipboard.")
+        else:
+            st.warning("Failed to copy. Please copy the path manually.")
+    
+    # Option to view snapshot content
+    if st.button("View Snapshot Content"):
+        st.code(read_preview(output_path))
+    
+    if st.button("Prepare Download"):
+        with open(output_path, "rb") as file:
+            st.download_button("Download full snapshot", data=file, file_name=output_path.name)
 
 def main():
     st.set_page_config(page_title="Project Snapshot", page_icon="📸", layout="wide")
@@ -51,98 +221,18 @@ def main():
     st.title("📸 Project Snapshot")
     st.subheader("AI-Ready Project Capture Tool")
     
-    # Sidebar for configuration management
     with st.sidebar:
-        st.header("Configuration")
-        config = load_config()
-        
-        # Directory selection
-        st.subheader("1. Select Project Directory")
-        
-        # Use session state to store the selected directory
-        if "root_directory" not in st.session_state:
-            st.session_state.root_directory = config.get("last_directory", str(Path.cwd()))
-
-        current_path = Path(st.session_state.root_directory)
-        st.write(f"Current directory: {current_path}")
-
-        # Go up one level
-        if current_path != current_path.root:
-            if st.button("⬆️ Up one level"):
-                st.session_state.root_directory = str(current_path.parent)
-                st.rerun()  # Changed from st.experimental_rerun()
-
-        # List subdirectories
-        subdirs = get_subdirectories(current_path)
-        if subdirs:
-            selected_subdir = st.selectbox("Select subdirectory", [""] + [d.name for d in subdirs])
-            if selected_subdir:
-                st.session_state.root_directory = str(current_path / selected_subdir)
-                st.rerun()  # Changed from st.experimental_rerun()
-
-        # Manual input
-        root_directory = st.text_input("Or enter path manually", value=st.session_state.root_directory, key="directory_input")
-        
-        if not Path(root_directory).is_dir():
-            st.error("Invalid directory. Please select a valid directory or enter a valid path.")
-            return
-        
-        # Update the last_directory in config
-        config["last_directory"] = root_directory
-        save_config(config)
+        st.session_state.in_app_run = True
+        try:
+            sidebar_controls()
+        finally:
+            # st.rerun() and st.stop() raise, so always clear the flag
+            st.session_state.in_app_run = False
+
+    root_directory, selected_config = st.session_state.selection
+    if root_directory is None:
+        return
 
-        # Configuration management
-        st.subheader("2. Manage Configurations")
-        matching_configs = [c for c in config["configurations"] if c["directory"] == root_directory]
-        
-        if matching_configs:
-            selected_config = st.selectbox(
-                "Select Configuration",
-                options=matching_configs,
-                format_func=lambda x: x['project_name'],
-                key="config_select"
-            )
-            
-            action = st.radio("Action", ["Use Selected", "Edit", "Delete", "Create New"])
-        else:
-            st.info("No existing configurations found for this directory.")
-            action = "Create New"
-        
-        if action in ["Edit", "Create New"]:
-            st.subheader("3. Configure Snapshot")
-            project_name = st.text_input("Project Name", value=selected_config['project_name'] if action == "Edit" else Path(root_directory).name)
-            output_pattern = st.text_input("Output Pattern", value=selected_config['output_pattern'] if action == "Edit" else f"{project_name}_contents-{{time}}.md")
-            include_in_prompt = st.checkbox("Include in AI prompt", value=selected_config['include_in_prompt'] if action == "Edit" else True)
-            
-            if st.button("Save Configuration"):
-                new_config = {
-                    "project_name": sanitize_filename(project_name),
-                    "directory": root_directory,
-                    "output_pattern": output_pattern,
-                    "include_in_prompt": include_in_prompt,
-                    "last_used": datetime.now().strftime("%Y-%m-%d"),
-                }
-                
-                if action == "Edit":
-                    config["configurations"][config["configurations"].index(selected_config)] = new_config
-                else:
-                    if len([c for c in config["configurations"] if c["directory"] == root_directory]) >= MAX_CONFIGS_PER_PROJECT:
-                        st.warning(f"Maximum configurations ({MAX_CONFIGS_PER_PROJECT}) reached. Replacing oldest.")
-                        config["configurations"] = [c for c in config["configurations"] if c["directory"] != root_directory] + [new_config]
-                    else:
-                        config["configurations"].append(new_config)
-                
-                save_config(config)
-                st.success("Configuration saved!")
-                st.rerun()  # Changed from st.experimental_rerun()
-        
-        elif action == "Delete":
-            if st.button("Confirm Deletion"):
-                config["configurations"].remove(selected_config)
-                save_config(config)
-                st.success("Configuration deleted!")
-                st.rerun()  # Changed from st.experimental_rerun()
-    
     # Main content area
     st.header("Generate Project Snapshot")
     
@@ -151,7 +241,7 @@ def main():
     with col1:
         st.subheader("Project Details")
         st.write(f"**Directory:** {root_directory}")
-        if 'selected_config' in locals():
+        if selected_config is not None:
             st.write(f"**Project Name:** {selected_config['project_name']}")
             st.write(f"**Output Pattern:** {selected_config['output_pattern']}")
             st.write(f"**Include in AI Prompt:** {'Yes' if selected_config['include_in_prompt'] else 'No'}")
@@ -160,12 +250,12 @@ def main():
         st.subheader("Actions")
         if st.button("Generate Snapshot", key="generate_button"):
             try:
-                if 'selected_config' not in locals():
+                if selected_config is None:
                     st.error("Please select or create a configuration first.")
                     return
                 
                 output_filename = selected_config["output_pattern"].format(time=datetime.now().strftime("%Y-%m-%d-%H%M%S"))
-                output_path = Path(__file__).resolve().parent / "output" / selected_config["project_name"] / output_filename
+                output_path = SCRIPT_DIR / "output" / selected_config["project_name"] / output_filename
                 
                 with st.spinner("Generating snapshot..."):
                     result = save_project_contents(
@@ -176,29 +266,8 @@ def main():
                     )
                 
                 st.success("Snapshot generated successfully!")
-                
-                # Display results
-                st.subheader("Snapshot Results")
-                st.write(f"**Output File:** {output_path}")
-                st.write(f"**Processed Files:** {result['processed']}")
-                st.write(f"**Skipped Files:** {result['skipped']}")
-                st.write(f"**Errors:** {len(result['errors'])}")
-                
-                if result['errors']:
-                    with st.expander("View Errors"):
-                        for error in result['errors']:
-                            st.write(error)
-                
-                if st.button("Copy Output Path"):
-                    if copy_to_clipboard(str(output_path)):
-                        st.success("Output path copied to clipboard.")
-                    else:
-                        st.warning("Failed to copy. Please copy the path manually.")
-                
-                # Option to view snapshot content
-                if st.button("View Snapshot Content"):
-                    with open(output_path, 'r') as file:
-                        st.code(file.read())
+                # Keep the result so the follow-up buttons work on later reruns
+                st.session_state.last_snapshot = (output_path, result)
                 
             except ProjectSnapshotError as e:
                 st.error(f"Error generating snapshot: {str(e)}")
@@ -206,6 +275,9 @@ def main():
                 st.error(f"Unexpected error: {str(e)}")
                 logger.exception("An unexpected error occurred")
 
+        if "last_snapshot" in st.session_state:
+            show_snapshot_results(*st.session_state.last_snapshot)
+
     # Help and Documentation
     with st.expander("Help & Documentation"):
         st.markdown("""
@@ -1,10 +1,16 @@
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
 from pathlib import Path
-from datetime import datetime, timedelta
+import io
 import json
 import logging
+import os
+import re
+import tempfile
+import pathspec
+from rich.prompt import Confirm, Prompt
 import main
+from snapshot import capture
 from snapshot.capture import (
     load_gitignore_patterns,
     get_language,
@@ -12,62 +18,169 @@ from snapshot.capture import (
     read_file_content,
     save_project_contents,
     is_binary_file,
+    parallel_walk,
+    stream_file_content,
+    combine_ignore_specs,
+    compile_ignore_matcher,
+    STREAM_THRESHOLD,
+)
+from snapshot.config import (
+    CONFIG_FILE,
+    MAX_CONFIGS_PER_PROJECT,
+    add_configuration,
+    index_configurations,
+    load_config,
+    save_config,
 )
 from snapshot.exceptions import ProjectSnapshotError
 from snapshot.utils import copy_to_clipboard, sanitize_filename
 
+# Set up a logger for the tests once, rather than adding a handler per test
+TEST_LOGGER = logging.getLogger("test_logger")
+TEST_LOGGER.setLevel(logging.DEBUG)
+if not TEST_LOGGER.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    TEST_LOGGER.addHandler(_handler)
+
+# Expected snapshot sections, in the order they are written
+_EXPECTED_SNAPSHOT = re.compile(
+    r"# Project Snapshot: test_project.*## Directory Tree.*## File Contents"
+    r".*### file1\.txt.*### file2\.py.*### dir1/file3\.md",
+    re.S,
+)
+_EXPECTED_SNAPSHOT_WITH_ERRORS = re.compile(
+    r"# Project Snapshot: test_project.*## Directory Tree.*## File Contents"
+    r".*### file1\.txt.*### file2\.dat.*File content not displayed due to an error",
+    re.S,
+)
 
-class TestSnapshotFunctions(unittest.TestCase):
-    def setUp(self):
-        # Suppress Rich console output during tests
-        self.original_console = main.console
-        main.console = MagicMock()
 
-        # Set up global patches
-        self.mock_confirm_patcher = patch("rich.prompt.Confirm.ask")
-        self.mock_prompt_patcher = patch("rich.prompt.Prompt.ask")
-        self.mock_confirm = self.mock_confirm_patcher.start()
-        self.mock_prompt = self.mock_prompt_patcher.start()
+class _NullConsole:
+    """Console stand-in whose methods all do nothing."""
 
-        # Set default return values
-        self.mock_confirm.return_value = False
-        self.mock_prompt.return_value = "1"
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
 
-        # Set up a logger for the tests
-        self.logger = logging.getLogger("test_logger")
-        self.logger.setLevel(logging.DEBUG)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-
-    def tearDown(self):
-        # Restore the original console
-        main.console = self.original_console
-
-        # Stop global patches
-        self.mock_confirm_patcher.stop()
-        self.mock_prompt_patcher.stop()
-
-    def create_mock_config(self, project_name, include_in_prompt=True):
-        return {
-            "project_name": project_name,
-            "directory": "/fake/path",
-            "output_pattern": f"{project_name}-{{time}}.md",
-            "include_in_prompt": include_in_prompt,
-            "last_used": datetime.now().strftime("%Y-%m-%d"),
-        }
+
+_NULL_CONSOLE = _NullConsole()
+
+# 2MB of text, read through read_file_content in one piece
+_LARGE_CONTENT = b"line\n" * 400_000
+
+# Shared no-op ignore spec; its compiled matcher is cached by identity
+_EMPTY_PATTERNS = pathspec.PathSpec([])
+
+# (input, expected) pairs for escape_markdown
+_MD_CASES = (
+    (
+        "This is a *test* with [markdown](syntax)",
+        "This is a \\*test\\* with \\[markdown\\]\\(syntax\\)",
+    ),
+    (r"```py\n```", r"\\`\\`\\`py\\n\\`\\`\\`"),
+    ("a*b", "a\\*b"),
+    ("[x](y)", "\\[x\\]\\(y\\)"),
+    ("*[*]*", "\\*\\[\\*\\]\\*"),
+    ("# 1. item!", "\\# 1\\. item\\!"),
+    ("a_b-c+d", "a\\_b\\-c\\+d"),
+    (r"C:\dir", r"C:\\dir"),
+    ("a`b", "a`b"),
+    ("plain", "plain"),
+)
+
+# Paths shared by the main module tests
+_FAKE_ROOT = Path("/fake/root")
+_FAKE_PATH = Path("/fake/path")
+_NEW_PATH = Path("/new/path")
+_VALID_PATH = Path("/valid/path")
+
+# Fixed date for mock configurations, so no test depends on the clock
+_LAST_USED = "2024-07-25"
+
+
+def _mock_config(project_name, include_in_prompt=True):
+    return {
+        "project_name": project_name,
+        "directory": "/fake/path",
+        "output_pattern": f"{project_name}-{{time}}.md",
+        "include_in_prompt": include_in_prompt,
+        "last_used": _LAST_USED,
+    }
+
+
+# One directory's worth of configurations, two more than the per-project limit;
+# add_configuration stores but never mutates them. The first MAX_CONFIGS_PER_PROJECT
+# were last used in reverse list order, so the oldest sits at the end of the list;
+# the two extra entries are the newest.
+_FIFO_CONFIGS = tuple(
+    {**_mock_config(f"test{i}"), "last_used": f"2024-07-{day:02d}"}
+    for i, day in enumerate(
+        [*range(MAX_CONFIGS_PER_PROJECT, 0, -1)]
+        + [MAX_CONFIGS_PER_PROJECT + 1, MAX_CONFIGS_PER_PROJECT + 2]
+    )
+)
+
+
+def _fake_open():
+    # Collect writes in a real buffer instead of the mock's call list
+    buffer = io.BytesIO()
+    mock_file = MagicMock()
+    mock_file.return_value.__enter__.return_value.write = buffer.write
+    return mock_file, buffer
+
+
+class TestCaptureFunctions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Write the large file once for the class rather than per test
+        temp_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(temp_dir.cleanup)
+        cls.large_path = Path(temp_dir.name) / "large.txt"
+        cls.large_path.write_bytes(_LARGE_CONTENT)
+
+    def create_project_tree(self, relative_paths):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        root_directory = Path(temp_dir.name)
+        for relative_path in relative_paths:
+            file_path = root_directory / relative_path
+            os.makedirs(file_path.parent, exist_ok=True)
+            file_path.write_text("")
+        return root_directory
 
     def test_load_gitignore_patterns(self):
-        mock_gitignore_content = "*.pyc\n__pycache__\n"
-        with patch("pathlib.Path.open", mock_open(read_data=mock_gitignore_content)):
-            with patch("pathlib.Path.exists", return_value=True):
-                patterns = load_gitignore_patterns(Path("/fake/path"))
+        root_directory = self.create_project_tree([])
+        (root_directory / ".gitignore").write_text("*.pyc\n__pycache__\n")
+        patterns = load_gitignore_patterns(root_directory)
         self.assertTrue(patterns.match_file("test.pyc"))
         self.assertTrue(patterns.match_file("__pycache__"))
         self.assertFalse(patterns.match_file("test.py"))
+        self.assertIs(load_gitignore_patterns(root_directory), patterns)
+
+    def test_load_gitignore_patterns_missing_file(self):
+        patterns = load_gitignore_patterns(self.create_project_tree([]))
+        self.assertFalse(patterns.match_file("test.pyc"))
+
+    def test_combine_ignore_specs(self):
+        first = pathspec.GitIgnoreSpec.from_lines(["*.log"])
+        second = pathspec.GitIgnoreSpec.from_lines(["!keep.log"])
+        combined = combine_ignore_specs(first, second)
+        self.assertTrue(combined.match_file("debug.log"))
+        self.assertFalse(combined.match_file("keep.log"))
+        self.assertIs(combine_ignore_specs(first, second), combined)
+        self.assertIs(
+            compile_ignore_matcher(combined), compile_ignore_matcher(combined)
+        )
+
+    def test_compile_ignore_matcher(self):
+        paths = ["a.pyc", "keep.pyc", "src/build/", "src/build.py", "docs/"]
+        for lines in (["*.pyc", "build/", "/docs"], ["*.pyc", "!keep.pyc"], []):
+            spec = pathspec.GitIgnoreSpec.from_lines(lines)
+            self.assertEqual(
+                compile_ignore_matcher(spec)(paths), set(spec.match_files(paths))
+            )
 
     def test_get_language(self):
         self.assertEqual(get_language(".py"), "python")
@@ -75,40 +188,28 @@ class TestSnapshotFunctions(unittest.TestCase):
         self.assertEqual(get_language(".unknown"), "")
 
     def test_escape_markdown(self):
-        test_string = "This is a *test* with [markdown](syntax)"
-        expected = "This is a \\*test\\* with \\[markdown\\]\\(syntax\\)"
-        self.assertEqual(escape_markdown(test_string), expected)
-
-    @patch("snapshot.capture.mmap.mmap")
-    @patch("snapshot.capture.Path.open")
-    @patch("snapshot.capture.Path.stat")
-    def test_read_file_content_large_file(self, mock_stat, mock_open, mock_mmap):
-        mock_stat.return_value.st_size = 2_000_000
-        mock_file = MagicMock()
-        mock_open.return_value.__enter__.return_value = mock_file
-        mock_mmap.return_value.__enter__.return_value.read.return_value = (
-            b"Large file content"
-        )
+        for text, expected in _MD_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(escape_markdown(text), expected)
 
-        content = read_file_content(Path("large_file.txt"))
-
-        self.assertEqual(content, "Large file content")
-        mock_open.assert_called_once_with("rb")
-        mock_mmap.assert_called_once()
+    def test_read_file_content_large_file(self):
+        content = read_file_content(self.large_path)
+        self.assertEqual(content, _LARGE_CONTENT.decode())
 
+    @patch.object(capture.Path, "open", mock_open(read_data=b"Small file content"))
     def test_read_file_content_small_file(self):
-        with patch(
-            "snapshot.capture.Path.read_text", return_value="Small file content"
-        ):
-            with patch("snapshot.capture.Path.stat") as mock_stat:
-                mock_stat.return_value.st_size = 500_000
-                content = read_file_content(Path("small_file.txt"))
+        content = read_file_content(Path("small_file.txt"))
         self.assertEqual(content, "Small file content")
 
-    def test_read_file_content_binary_file(self):
-        with patch("snapshot.capture.is_binary_file", return_value=True):
-            with self.assertRaises(ProjectSnapshotError):
-                read_file_content(Path("binary_file.exe"))
+    @patch.object(capture, "is_binary_file", return_value=True)
+    def test_read_file_content_binary_file(self, mock_is_binary):
+        with self.assertRaises(ProjectSnapshotError):
+            read_file_content(Path("binary_file.exe"))
+
+    @patch.object(capture.Path, "open", mock_open(read_data=b"\x7fELF\x00\x01"))
+    def test_read_file_content_binary_content(self):
+        with self.assertRaisesRegex(ProjectSnapshotError, "Skipping binary file"):
+            read_file_content(Path("program"))
 
     def test_is_binary_file(self):
         self.assertTrue(is_binary_file(Path("test.jpg")))
@@ -116,44 +217,302 @@ class TestSnapshotFunctions(unittest.TestCase):
         self.assertFalse(is_binary_file(Path("test.txt")))
         self.assertFalse(is_binary_file(Path("test.py")))
 
-    @patch("pyperclip.copy")
-    def test_copy_to_clipboard(self, mock_copy):
-        result = copy_to_clipboard("Test text")
-        self.assertTrue(result)
-        mock_copy.assert_called_with("Test text")
+    @patch.object(capture, "load_gitignore_patterns")
+    @patch.object(capture, "read_file_content")
+    def test_save_project_contents(self, mock_read_content, mock_load_patterns):
+        root_directory = self.create_project_tree(
+            ["file1.txt", "file2.py", "dir1/file3.md", ".git/HEAD", "venv/bin/activate"]
+        )
+        output_path = self.create_project_tree([]) / "output" / "project_contents.md"
+        project_name = "test_project"
+        include_in_prompt = True
+
+        mock_load_patterns.return_value = _EMPTY_PATTERNS
+        mock_read_content.return_value = "File content"
+
+        result = save_project_contents(
+            root_directory, output_path, project_name, include_in_prompt
+        )
+
+        self.assertEqual(result["processed"], 3)
+        self.assertEqual(result["skipped"], 0)
+        self.assertEqual(result["errors"], [])
+
+        written_content = output_path.read_text()
+        self.assertRegex(written_content, _EXPECTED_SNAPSHOT)
+        self.assertNotIn(".git/", written_content)
+        self.assertNotIn("venv/", written_content)
+
+    @patch.object(capture, "load_gitignore_patterns")
+    @patch.object(capture, "read_file_content")
+    def test_save_project_contents_with_errors(
+        self, mock_read_content, mock_load_patterns
+    ):
+        root_directory = self.create_project_tree(
+            ["file1.txt", "file2.dat", "file3.txt"]
+        )
+        # Not a denied extension, so only the NUL sniff can reject it
+        (root_directory / "file2.dat").write_bytes(b"\x7fELF\x00\x01")
+        output_path = self.create_project_tree([]) / "output" / "project_contents.md"
+        project_name = "test_project"
+        include_in_prompt = True
+
+        mock_load_patterns.return_value = _EMPTY_PATTERNS
+        read_results = {
+            "file1.txt": "File content",
+            "file3.txt": ProjectSnapshotError("Error reading file: file3.txt"),
+        }
+
+        def read_content(file_path):
+            if file_path.name not in read_results:
+                return read_file_content(file_path)
+            result = read_results[file_path.name]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        mock_read_content.side_effect = read_content
+
+        result = save_project_contents(
+            root_directory, output_path, project_name, include_in_prompt
+        )
+
+        self.assertEqual(result["processed"], 1)
+        self.assertEqual(result["skipped"], 1)
+        self.assertEqual(len(result["errors"]), 1)
+
+        written_content = output_path.read_text()
+        self.assertRegex(written_content, _EXPECTED_SNAPSHOT_WITH_ERRORS)
+
+    @patch.object(capture, "read_file_content")
+    @patch.object(capture, "load_gitignore_patterns")
+    def test_save_project_contents_streams_large_files(
+        self, mock_load_patterns, mock_read_content
+    ):
+        root_directory = self.create_project_tree([])
+        large_content = "x" * (STREAM_THRESHOLD + 1)
+        (root_directory / "large.txt").write_text(large_content)
+        output_path = self.create_project_tree([]) / "project_contents.md"
+        mock_load_patterns.return_value = _EMPTY_PATTERNS
+
+        result = save_project_contents(
+            root_directory, output_path, "test_project", False
+        )
+
+        self.assertEqual(result["processed"], 1)
+        mock_read_content.assert_not_called()
+        written_content = output_path.read_text()
+        self.assertIn(f"```text\n{large_content}\n```\n", written_content)
+
+    @patch.object(capture, "parallel_walk")
+    @patch.object(capture, "load_gitignore_patterns")
+    def test_save_project_contents_keeps_previous_output_on_failure(
+        self, mock_load_patterns, mock_walk
+    ):
+        output_path = self.create_project_tree(["project_contents.md"]) / (
+            "project_contents.md"
+        )
+        output_path.write_text("previous snapshot")
+        mock_load_patterns.return_value = _EMPTY_PATTERNS
+        mock_walk.side_effect = OSError("Permission denied")
+
+        with self.assertRaises(ProjectSnapshotError):
+            save_project_contents(
+                self.create_project_tree([]), output_path, "test_project", False
+            )
+
+        self.assertEqual(output_path.read_text(), "previous snapshot")
+        self.assertEqual(os.listdir(output_path.parent), ["project_contents.md"])
+
+    @patch.object(capture, "MAX_EMBED_BYTES", 16)
+    @patch.object(capture, "read_file_content")
+    @patch.object(capture, "load_gitignore_patterns")
+    def test_save_project_contents_skips_oversized_files(
+        self, mock_load_patterns, mock_read_content
+    ):
+        root_directory = self.create_project_tree([])
+        (root_directory / "huge.md").write_text("x" * 17)
+        output_path = self.create_project_tree([]) / "project_contents.md"
+        mock_load_patterns.return_value = _EMPTY_PATTERNS
+
+        result = save_project_contents(
+            root_directory, output_path, "test_project", False
+        )
+
+        self.assertEqual(result, {"processed": 0, "skipped": 1, "errors": []})
+        mock_read_content.assert_not_called()
+        self.assertIn("### huge.md\n\n<skipped: 17 bytes>\n", output_path.read_text())
+
+    def test_env_int(self):
+        with patch.dict(os.environ, {"SNAPSHOT_TEST_INT": "42"}):
+            self.assertEqual(capture._env_int("SNAPSHOT_TEST_INT", 7), 42)
+        with patch.dict(os.environ, {"SNAPSHOT_TEST_INT": "5MB"}):
+            with self.assertLogs(capture.logger, logging.WARNING):
+                self.assertEqual(capture._env_int("SNAPSHOT_TEST_INT", 7), 7)
+        self.assertEqual(capture._env_int("SNAPSHOT_TEST_UNSET", 7), 7)
+
+    @patch.object(capture, "COPY_BUFSIZE", 4)
+    def test_stream_file_content_escapes_markdown_across_blocks(self):
+        content = "a ``` b ``\n`# *x*\n"
+        file_path = self.create_project_tree(["notes.md"]) / "notes.md"
+        file_path.write_text(content)
+        out = io.StringIO()
+
+        stream_file_content(file_path, out, "markdown")
+
+        self.assertEqual(
+            out.getvalue(), f"```markdown\n{escape_markdown(content)}```\n\n"
+        )
 
+    def test_read_file_content_normalizes_newlines(self):
+        file_path = self.create_project_tree(["crlf.txt"]) / "crlf.txt"
+        file_path.write_bytes(b"one\r\ntwo\rthree\n")
+        self.assertEqual(read_file_content(file_path), "one\ntwo\nthree\n")
+
+    def test_parallel_walk(self):
+        root_directory = self.create_project_tree(
+            ["z.py", "a.py", "pkg/b.py", "pkg/sub/c.py", "build/out.txt", "cache/d.py"]
+        )
+        spec = pathspec.PathSpec.from_lines("gitwildmatch", ["build", "cache/"])
+
+        entries = list(parallel_walk(str(root_directory), spec, max_workers=4))
+
+        self.assertEqual(
+            [(rel_path, is_dir) for rel_path, _, is_dir, _ in entries],
+            [
+                ("a.py", False),
+                ("z.py", False),
+                ("pkg", True),
+                ("pkg/b.py", False),
+                ("pkg/sub", True),
+                ("pkg/sub/c.py", False),
+            ],
+        )
+        self.assertEqual(entries[3][1], str(root_directory / "pkg" / "b.py"))
+        self.assertEqual(entries[0][3], 0)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks not supported")
+    def test_parallel_walk_includes_symlinked_files(self):
+        root_directory = self.create_project_tree([])
+        (root_directory / "target.txt").write_text("linked")
+        try:
+            os.symlink(root_directory / "target.txt", root_directory / "link.txt")
+        except OSError:
+            self.skipTest("cannot create symlinks here")
+
+        entries = list(parallel_walk(str(root_directory), _EMPTY_PATTERNS))
+
+        self.assertEqual(
+            [(rel_path, size) for rel_path, _, _, size in entries],
+            [("link.txt", 6), ("target.txt", 6)],
+        )
+
+
+class TestConfigFunctions(unittest.TestCase):
     @patch("builtins.open", new_callable=mock_open, read_data='{"configurations": []}')
     def test_load_config(self, mock_file):
-        with patch("pathlib.Path.exists", return_value=True):
-            config = main.load_config()
+        config = load_config()
         self.assertIn("configurations", config)
         self.assertEqual(config["configurations"], [])
 
-    def test_load_config_file_not_found(self):
-        with patch("pathlib.Path.exists", return_value=False):
-            config = main.load_config()
+    @patch("builtins.open", side_effect=FileNotFoundError)
+    def test_load_config_file_not_found(self, mock_file):
+        config = load_config()
         self.assertEqual(config, {"configurations": []})
 
-    @patch("builtins.open", new_callable=mock_open)
-    def test_save_config(self, mock_file):
+    def test_save_config(self):
         config = {"configurations": [{"name": "test"}]}
-        main.save_config(config)
-        mock_file.assert_called_once_with(main.CONFIG_FILE, "w")
-        handle = mock_file()
-        written_content = "".join(call.args[0] for call in handle.write.call_args_list)
-        expected_content = json.dumps(config, indent=4)
-        self.assertEqual(written_content, expected_content)
-
-    def test_create_or_edit_configuration(self):
-        root_directory = Path("/fake/root")
-        self.mock_confirm.side_effect = [True, True, True]
+        mock_file, buffer = _fake_open()
+        with patch("builtins.open", mock_file):
+            save_config(config)
+        mock_file.assert_called_once_with(CONFIG_FILE, "wb")
+        self.assertEqual(json.loads(buffer.getvalue()), config)
+
+    def test_add_configuration(self):
+        config = {"configurations": []}
+        new_config = _mock_config("test")
+
+        add_configuration(config, new_config)
+        self.assertEqual(len(config["configurations"]), 1)
+        self.assertEqual(config["configurations"][0], new_config)
+
+    def test_add_configuration_max_limit(self):
+        limit = MAX_CONFIGS_PER_PROJECT
+        # Start at the limit so every addition goes through the eviction branch
+        config = {"configurations": list(_FIFO_CONFIGS[:limit])}
+        # The least recently used entries go first, whatever their position
+        expected_evictions = (_FIFO_CONFIGS[limit - 1], _FIFO_CONFIGS[limit - 2])
+        for new_config, evicted in zip(_FIFO_CONFIGS[limit:], expected_evictions):
+            with self.subTest(name=new_config["project_name"]):
+                add_configuration(config, new_config)
+                self.assertEqual(len(config["configurations"]), limit)
+                self.assertIs(config["configurations"][-1], new_config)
+                self.assertNotIn(evicted, config["configurations"])
+
+        self.assertEqual(
+            [c["project_name"] for c in config["configurations"]],
+            [c["project_name"] for c in _FIFO_CONFIGS[: limit - 2]]
+            + [c["project_name"] for c in _FIFO_CONFIGS[limit:]],
+        )
+
+    def test_index_configurations(self):
+        other_config = _mock_config("other")
+        other_config["directory"] = "/other/path"
+        configurations = [
+            _mock_config("project1"),
+            other_config,
+            _mock_config("project2"),
+        ]
+        index = index_configurations(configurations)
+        self.assertEqual(index["/fake/path"], [0, 2])
+        self.assertEqual(index["/other/path"], [1])
+
+
+class TestMainFunctions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Patch the Rich prompts once for the whole class
+        cls.mock_confirm_patcher = patch.object(Confirm, "ask")
+        cls.mock_confirm = cls.mock_confirm_patcher.start()
+        cls.addClassCleanup(cls.mock_confirm_patcher.stop)
+        cls.mock_prompt_patcher = patch.object(Prompt, "ask")
+        cls.mock_prompt = cls.mock_prompt_patcher.start()
+        cls.addClassCleanup(cls.mock_prompt_patcher.stop)
+
+    def setUp(self):
+        # Suppress Rich console output during tests
+        console_patcher = patch.object(main, "console", _NULL_CONSOLE)
+        console_patcher.start()
+        self.addCleanup(console_patcher.stop)
+
+        # Reset the shared prompt mocks to their default return values
+        self.mock_confirm.reset_mock(return_value=True, side_effect=True)
+        self.mock_prompt.reset_mock(return_value=True, side_effect=True)
+        self.mock_confirm.return_value = False
+        self.mock_prompt.return_value = "1"
+
+        # Share one logger for the tests
+        self.logger = TEST_LOGGER
+
+    @patch("pyperclip.copy")
+    def test_copy_to_clipboard(self, mock_copy):
+        result = copy_to_clipboard("Test text")
+        self.assertTrue(result)
+        mock_copy.assert_called_with("Test text")
+
+    @patch.object(main, "datetime")
+    def test_create_or_edit_configuration(self, mock_datetime):
+        mock_datetime.now.return_value.strftime.return_value = _LAST_USED
+        root_directory = _FAKE_ROOT
+        self.mock_confirm.side_effect = (True, True, True)
         result = main.create_or_edit_configuration(root_directory)
         self.assertEqual(result["project_name"], "root")
         self.assertEqual(result["output_pattern"], "root_contents-{time}.md")
         self.assertTrue(result["include_in_prompt"])
+        self.assertEqual(result["last_used"], _LAST_USED)
 
-        self.mock_confirm.side_effect = [False, False, False]
-        self.mock_prompt.side_effect = ["custom project", "custom_{time}"]
+        self.mock_confirm.side_effect = (False, False, False)
+        self.mock_prompt.side_effect = ("custom project", "custom_{time}")
         result = main.create_or_edit_configuration(root_directory)
         self.assertEqual(result["project_name"], "custom project")
         self.assertEqual(result["output_pattern"], "custom_{time}-{time}.md")
@@ -171,289 +530,155 @@ class TestSnapshotFunctions(unittest.TestCase):
         self.mock_prompt.return_value = "2"
         self.assertEqual(main.get_user_choice(3), "2")
 
-    @patch("pathlib.Path.is_dir")
+    @patch.object(Path, "is_dir")
     def test_get_target_directory(self, mock_is_dir):
         config = {"last_directory": "/fake/path"}
         self.mock_confirm.return_value = False
         result = main.get_target_directory(config)
-        self.assertEqual(result, Path("/fake/path"))
+        self.assertEqual(result, _FAKE_PATH)
 
         self.mock_confirm.return_value = True
         self.mock_prompt.return_value = "/new/path"
         mock_is_dir.return_value = True
         result = main.get_target_directory(config)
-        self.assertEqual(result, Path("/new/path"))
+        self.assertEqual(result, _NEW_PATH)
 
-        self.mock_prompt.side_effect = ["/invalid/path", "/valid/path"]
-        mock_is_dir.side_effect = [False, True]
+        self.mock_prompt.side_effect = ("/invalid/path", "/valid/path")
+        mock_is_dir.side_effect = (False, True)
         result = main.get_target_directory(config)
-        self.assertEqual(result, Path("/valid/path"))
+        self.assertEqual(result, _VALID_PATH)
 
     def test_is_duplicate_config(self):
         existing_configs = [
-            self.create_mock_config("test1"),
-            self.create_mock_config("test2", include_in_prompt=False),
+            _mock_config("test1"),
+            _mock_config("test2", include_in_prompt=False),
         ]
 
-        duplicate_config = self.create_mock_config("test1")
+        duplicate_config = _mock_config("test1")
         self.assertTrue(main.is_duplicate_config(duplicate_config, existing_configs))
 
-        new_config = self.create_mock_config("test3")
+        new_config = _mock_config("test3")
         self.assertFalse(main.is_duplicate_config(new_config, existing_configs))
 
-    def test_add_configuration(self):
-        config = {"configurations": []}
-        new_config = self.create_mock_config("test")
-
-        main.add_configuration(config, new_config)
-        self.assertEqual(len(config["configurations"]), 1)
-        self.assertEqual(config["configurations"][0], new_config)
-
-    def test_add_configuration_max_limit(self):
-        config = {"configurations": []}
-        for i in range(main.MAX_CONFIGS_PER_PROJECT + 2):
-            new_config = self.create_mock_config(f"test{i}")
-            main.add_configuration(config, new_config)
-
-        self.assertEqual(len(config["configurations"]), main.MAX_CONFIGS_PER_PROJECT)
-        self.assertEqual(
-            config["configurations"][-1]["project_name"],
-            f"test{main.MAX_CONFIGS_PER_PROJECT + 1}",
-        )
-
-    @patch("main.get_user_choice")
-    @patch("main.get_target_directory")
-    @patch("main.load_config")
-    @patch("main.save_config")
-    @patch("main.save_project_contents")
-    def test_main_delete_config(
-        self,
-        mock_save_contents,
-        mock_save_config,
-        mock_load_config,
-        mock_get_target,
-        mock_get_choice,
-    ):
-        initial_config = {
-            "configurations": [
-                self.create_mock_config("project1"),
-                self.create_mock_config("project2", include_in_prompt=False),
-            ]
-        }
-
-        mock_load_config.return_value = initial_config.copy()
-        mock_get_target.return_value = Path("/fake/path")
-        mock_get_choice.side_effect = [
-            "3",  # Delete
-            "2",  # Choose second config
-            "1",  # Use remaining config
-        ]
-        mock_save_contents.return_value = {"processed": 1, "skipped": 0, "errors": []}
-
-        main.main()
-
-        mock_save_config.assert_called()
-        saved_config = mock_save_config.call_args[0][0]
-
-        self.assertEqual(
-            len(saved_config["configurations"]),
-            1,
-            "Configuration was not deleted correctly",
-        )
-        self.assertEqual(
-            saved_config["configurations"][0]["project_name"],
-            "project1",
-            "Wrong configuration was deleted",
-        )
-
-        # Simulate running main again with the updated configuration
-        mock_load_config.reset_mock()
-        mock_load_config.return_value = saved_config
-        mock_get_choice.side_effect = ["1"]  # Use the remaining config
-
-        main.main()
-
-        mock_save_config.assert_called()
-        final_config = mock_save_config.call_args[0][0]
-
-        self.assertEqual(
-            len(final_config["configurations"]),
-            1,
-            "Final configuration count is incorrect",
-        )
-        self.assertEqual(
-            final_config["configurations"][0]["project_name"],
-            "project1",
-            "Final configuration is incorrect",
-        )
-
-    @patch("main.get_user_choice")
-    @patch("main.get_target_directory")
-    @patch("main.load_config")
-    @patch("main.save_config")
-    @patch("main.save_project_contents")
-    def test_main_create_new_config(
+    @patch.object(main, "copy_to_clipboard")
+    @patch.object(main, "get_user_choice")
+    @patch.object(main, "get_target_directory")
+    @patch.object(main, "load_config")
+    @patch.object(main, "save_config")
+    @patch.object(main, "save_project_contents")
+    @patch.object(main, "datetime")
+    def test_main(
         self,
+        mock_datetime,
         mock_save_contents,
         mock_save_config,
         mock_load_config,
         mock_get_target,
         mock_get_choice,
-    ):
-        initial_config = {"configurations": []}
-
-        mock_load_config.return_value = initial_config.copy()
-        mock_get_target.return_value = Path("/fake/path")
-        mock_get_choice.side_effect = ["1"]  # Create new configuration
-        self.mock_confirm.side_effect = [
-            True,
-            True,
-            True,
-            False,
-        ]  # Use defaults for new config, don't copy to clipboard
-        mock_save_contents.return_value = {"processed": 1, "skipped": 0, "errors": []}
-
-        main.main()
-
-        mock_save_config.assert_called()
-        saved_config = mock_save_config.call_args[0][0]
-
-        self.assertEqual(
-            len(saved_config["configurations"]),
-            1,
-            "New configuration was not created correctly",
-        )
-        self.assertEqual(
-            saved_config["configurations"][0]["project_name"],
-            "path",
-            "Wrong project name for new configuration",
-        )
-
-    @patch("snapshot.capture.Path.mkdir")
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("snapshot.capture.load_gitignore_patterns")
-    @patch("snapshot.capture.os.walk")
-    @patch("snapshot.capture.read_file_content")
-    def test_save_project_contents(
-        self, mock_read_content, mock_walk, mock_load_patterns, mock_file, mock_mkdir
-    ):
-        root_directory = Path("/fake/root")
-        output_path = Path("/fake/output/project_contents.md")
-        project_name = "test_project"
-        include_in_prompt = True
-
-        mock_load_patterns.return_value.match_file.return_value = False
-        mock_walk.return_value = [
-            ("/fake/root", ["dir1"], ["file1.txt", "file2.py"]),
-            ("/fake/root/dir1", [], ["file3.md"]),
-        ]
-        mock_read_content.return_value = "File content"
-
-        result = save_project_contents(
-            root_directory, output_path, project_name, include_in_prompt
-        )
-
-        self.assertEqual(result["processed"], 3)
-        self.assertEqual(result["skipped"], 0)
-        self.assertEqual(result["errors"], [])
-
-        mock_mkdir.assert_called()
-        mock_file.assert_called_with(output_path, "w")
-        handle = mock_file()
-        written_content = "".join(call.args[0] for call in handle.write.call_args_list)
-        self.assertIn("# Project Snapshot: test_project", written_content)
-        self.assertIn("## Directory Tree", written_content)
-        self.assertIn("## File Contents", written_content)
-        self.assertIn("### file1.txt", written_content)
-        self.assertIn("### file2.py", written_content)
-        self.assertIn("### dir1/file3.md", written_content)
-
-    @patch("snapshot.capture.Path.mkdir")
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("snapshot.capture.load_gitignore_patterns")
-    @patch("snapshot.capture.os.walk")
-    @patch("snapshot.capture.read_file_content")
-    def test_save_project_contents_with_errors(
-        self, mock_read_content, mock_walk, mock_load_patterns, mock_file, mock_mkdir
-    ):
-        root_directory = Path("/fake/root")
-        output_path = Path("/fake/output/project_contents.md")
-        project_name = "test_project"
-        include_in_prompt = True
-
-        mock_load_patterns.return_value.match_file.return_value = False
-        mock_walk.return_value = [("/fake/root", [], ["file1.txt", "file2.bin"])]
-        mock_read_content.side_effect = [
-            "File content",
-            ProjectSnapshotError("Binary file"),
-        ]
-
-        result = save_project_contents(
-            root_directory, output_path, project_name, include_in_prompt
-        )
-
-        self.assertEqual(result["processed"], 1)
-        self.assertEqual(result["skipped"], 1)
-        self.assertEqual(len(result["errors"]), 1)
-
-        mock_mkdir.assert_called()
-        mock_file.assert_called_with(output_path, "w")
-        handle = mock_file()
-        written_content = "".join(call.args[0] for call in handle.write.call_args_list)
-        self.assertIn("# Project Snapshot: test_project", written_content)
-        self.assertIn("## Directory Tree", written_content)
-        self.assertIn("## File Contents", written_content)
-        self.assertIn("### file1.txt", written_content)
-        self.assertIn("### file2.bin", written_content)
-        self.assertIn("File content not displayed due to an error", written_content)
-
-    @patch("main.get_user_choice")
-    @patch("main.get_target_directory")
-    @patch("main.load_config")
-    @patch("main.save_config")
-    @patch("main.save_project_contents")
-    @patch("main.copy_to_clipboard")
-    def test_main_integration(
-        self,
         mock_copy_to_clipboard,
-        mock_save_contents,
-        mock_save_config,
-        mock_load_config,
-        mock_get_target,
-        mock_get_choice,
     ):
-        initial_config = {
-            "configurations": [
-                self.create_mock_config("project1"),
-                self.create_mock_config("project2", include_in_prompt=False),
-            ]
-        }
-
-        mock_load_config.return_value = initial_config.copy()
-        mock_get_target.return_value = Path("/fake/path")
-        mock_get_choice.side_effect = ["1"]  # Use existing configuration
+        mock_datetime.now.return_value.strftime.return_value = "2023-07-25-120000"
+        mock_get_target.return_value = _FAKE_PATH
         mock_save_contents.return_value = {"processed": 10, "skipped": 2, "errors": []}
         mock_copy_to_clipboard.return_value = True
-        self.mock_confirm.side_effect = [True]  # Copy to clipboard
-
-        with patch("main.datetime") as mock_datetime:
-            mock_datetime.now.return_value.strftime.return_value = "2023-07-25-120000"
-            main.main()
-
-        mock_save_config.assert_called()
-        mock_save_contents.assert_called_with(
-            Path("/fake/path"),
-            Path("/fake/path/output/project1/project1-2023-07-25-120000.md"),
-            "project1",
-            True,
-        )
-        mock_copy_to_clipboard.assert_called()
+
+        project1 = _mock_config("project1")
+        project2 = _mock_config("project2", include_in_prompt=False)
+        # (scenario, configurations, menu choices, ID prompts, confirms,
+        #  project names written by each save, expected output file)
+        cases = [
+            (
+                "delete",
+                [project1, project2],
+                ("4", "1"),  # Delete, then use the remaining config
+                ("2",),  # Delete the second config
+                (False,),  # Don't copy to clipboard
+                (["project1"], ["project1"]),  # Saved on delete, then on use
+                "project1/project1-2023-07-25-120000.md",
+            ),
+            (
+                "edit",
+                [project1, project2],
+                ("3",),  # Edit
+                ("2",),  # Edit the second config
+                (True, True, True, False),  # Keep defaults, include, don't copy
+                (["project1", "project2"],),
+                "project2/project2-2023-07-25-120000.md",
+            ),
+            (
+                "use_remaining",
+                [project1],
+                ("1",),
+                (),
+                (False,),
+                (["project1"],),
+                "project1/project1-2023-07-25-120000.md",
+            ),
+            (
+                "create_new",
+                (),
+                (),
+                (),
+                (True, True, True, False),  # Use defaults, don't copy
+                (["path"],),
+                "path/path_contents-2023-07-25-120000.md",
+            ),
+            (
+                "use_existing",
+                [project1, project2],
+                ("1",),
+                (),
+                (True,),  # Copy to clipboard
+                (["project1", "project2"],),
+                "project1/project1-2023-07-25-120000.md",
+            ),
+        ]
+
+        for (
+            scenario,
+            configurations,
+            choices,
+            prompts,
+            confirms,
+            expected_saves,
+            expected_output,
+        ) in cases:
+            with self.subTest(scenario=scenario):
+                for mock in (
+                    mock_save_contents,
+                    mock_save_config,
+                    mock_copy_to_clipboard,
+                ):
+                    mock.reset_mock()
+                mock_load_config.return_value = {
+                    "configurations": [dict(c) for c in configurations]
+                }
+                mock_get_choice.side_effect = choices
+                self.mock_prompt.side_effect = prompts
+                self.mock_confirm.side_effect = confirms
+                # Record what each save wrote, since later steps mutate the config
+                saves = []
+                mock_save_config.side_effect = lambda config: saves.append(
+                    [c["project_name"] for c in config["configurations"]]
+                )
+
+                main.main()
+
+                self.assertEqual(saves, list(expected_saves))
+                project_name = expected_output.split("/")[0]
+                mock_save_contents.assert_called_once_with(
+                    _FAKE_PATH,
+                    main.SCRIPT_DIR / "output" / expected_output,
+                    project_name,
+                    True,
+                )
+                self.assertEqual(mock_copy_to_clipboard.called, confirms[-1])
 
     def test_delete_configuration(self):
         config = {
             "configurations": [
-                self.create_mock_config("project1"),
-                self.create_mock_config("project2"),
+                _mock_config("project1"),
+                _mock_config("project2"),
             ]
         }
         main.delete_configuration(config, 0)
@@ -463,11 +688,11 @@ class TestSnapshotFunctions(unittest.TestCase):
     def test_edit_configuration(self):
         config = {
             "configurations": [
-                self.create_mock_config("project1"),
-                self.create_mock_config("project2"),
+                _mock_config("project1"),
+                _mock_config("project2"),
             ]
         }
-        new_config = self.create_mock_config("edited_project")
+        new_config = _mock_config("edited_project")
         main.edit_configuration(config, 0, new_config)
         self.assertEqual(config["configurations"][0]["project_name"], "edited_project")
 